@@ -15,12 +15,26 @@
 
 import os
 import json
-
-from flask import render_template, Blueprint, flash, request, redirect, url_for
+import atexit
+import random
+import threading
+
+import click
+from flask import (
+    render_template,
+    Blueprint,
+    flash,
+    request,
+    redirect,
+    url_for,
+    current_app,
+    has_app_context,
+)
+from CTFd.cache import cache
 from CTFd.plugins import register_plugin_assets_directory
 from CTFd.plugins.migrations import upgrade
 from CTFd.utils.decorators import admins_only
-from CTFd.models import db, Solves, Challenges, Teams
+from CTFd.models import Solves, Challenges, Teams, Submissions, Awards
 from CTFd.utils.dates import ctf_started
 from datetime import datetime, timedelta
 
@@ -28,6 +42,12 @@ from .models import WebhookLog
 from .webhooks import webhook_config, send_webhook
 from .events import event_registry
 from .event_definitions import *
+from .dedup import dedup_cache
+from .journal import record_event, replay_events
+from .scoreboard import scoreboard_snapshots, slice_scoreboard
+from .tracing import tracer
+from .aggregation import WindowAggregator
+from .payloads import COMPRESSIONS
 
 
 PLUGIN_PATH = os.path.dirname(__file__)
@@ -36,57 +56,195 @@ directory_name = PLUGIN_PATH.split(os.sep)[-1]  # Get the directory name of this
 
 webhooks_bp = Blueprint(directory_name, __name__, template_folder="templates")
 
-last_scoreboard_update = None
 SCOREBOARD_UPDATE_INTERVAL = timedelta(minutes=5)
 
+ACTIVITY_WINDOW = timedelta(minutes=1)
+SUBMISSION_SAMPLE_RATE = 0.0
+BRUTEFORCE_THRESHOLD = 20
+
+submission_aggregator = WindowAggregator(int(ACTIVITY_WINDOW.total_seconds()))
+award_aggregator = WindowAggregator(int(ACTIVITY_WINDOW.total_seconds()))
+
+
+def dispatch_event(event_type, *args, **kwargs):
+    """Generate and send an event unless the same occurrence was already sent.
+
+    The event id is derived from the registry before the payload is generated, so
+    duplicates (e.g. after_insert firing twice during a flush retry) are dropped
+    without running the payload queries.
+
+    Args:
+        event_type (str): The ID of the registered event.
+        *args: Positional arguments for the event's payload generator.
+        **kwargs: Keyword arguments for the event's payload generator.
+
+    Returns:
+        None
+    """
+
+    event_id = event_registry.get_event_id(event_type, *args, **kwargs)
+    if dedup_cache.seen(event_id):
+        print(f"[WEBHOOGZ] Duplicate {event_type} event {event_id} suppressed")
+        return
+
+    with tracer.trace(event_id, event_type):
+        with tracer.span("generate_payload"):
+            data = event_registry.generate_payload(event_type, *args, **kwargs)
+        with tracer.span("journal"):
+            record_event(event_id, event_type, data)
+        send_webhook(event_type, data, event_id=event_id)
+
+
+def dispatch_scoreboard_update(user_id=None, team_id=None):
+    """Generate and send a scoreboard_update tailored to each subscribed target.
+
+    Standings are queried once, for the largest top N among the targets. Targets in
+    full mode sharing the same top N receive the same payload; targets in diff mode
+    receive only their changes, and nothing when their top N did not change.
+
+    Args:
+        user_id (int, optional): The user whose solve triggered the update.
+        team_id (int, optional): The team whose solve triggered the update.
+
+    Returns:
+        None
+    """
+
+    event_id = event_registry.get_event_id("scoreboard_update")
+    with tracer.trace(event_id, "scoreboard_update"):
+        with tracer.span("get_targets"):
+            targets = webhook_config.get_targets_for_event("scoreboard_update")
+        top_ns = [target.scoreboard_top_n or 0 for target in targets]
+        top_n = 0 if 0 in top_ns else max(top_ns, default=5)
+
+        with tracer.span("generate_payload"):
+            data = event_registry.generate_payload(
+                "scoreboard_update", user_id=user_id, team_id=team_id, top_n=top_n
+            )
+        with tracer.span("journal"):
+            record_event(event_id, "scoreboard_update", data)
+        if not targets:
+            return
+
+        full_targets = {}
+        for target in targets:
+            target_top_n = target.scoreboard_top_n or 0
+            if not target.scoreboard_diff:
+                full_targets.setdefault(target_top_n, []).append(target)
+                continue
+
+            with tracer.span("scoreboard_diff", config_id=target.id):
+                diff = scoreboard_snapshots.diff(target.id, data, target_top_n)
+            if diff is None:
+                print(f"[WEBHOOGZ] Scoreboard unchanged for {target.url}, not sent")
+                continue
+            if not send_webhook(
+                "scoreboard_update", diff, event_id=event_id, targets=[target]
+            ):
+                # Resend everything next time rather than a diff the target never saw
+                scoreboard_snapshots.forget(target.id)
+
+        for target_top_n, group in full_targets.items():
+            send_webhook(
+                "scoreboard_update",
+                slice_scoreboard(data, target_top_n),
+                event_id=event_id,
+                targets=group,
+            )
+
 
 def scoreboard_update_hook(user_id=None, team_id=None):
-    global last_scoreboard_update
+    # Debounce through CTFd's cache so that all workers share the same timer
     now = datetime.utcnow()
-
-    # Check if enough time has elapsed since the last update
-    if (
-        last_scoreboard_update is None
-        or (now - last_scoreboard_update) >= SCOREBOARD_UPDATE_INTERVAL
+    if cache.add(
+        "webhoogz_last_scoreboard_update",
+        now,
+        timeout=int(SCOREBOARD_UPDATE_INTERVAL.total_seconds()),
     ):
-        data = event_registry.generate_payload(
-            "scoreboard_update", user_id=user_id, team_id=team_id
-        )
-        send_webhook("scoreboard_update", data)
-        last_scoreboard_update = now
+        dispatch_scoreboard_update(user_id=user_id, team_id=team_id)
     else:
+        last_scoreboard_update = cache.get("webhoogz_last_scoreboard_update")
         print(
-            f"[WEBHOOGZ] Scoreboard update skipped (last update: {last_scoreboard_update}, next allowed: {last_scoreboard_update + SCOREBOARD_UPDATE_INTERVAL})"
+            f"[WEBHOOGZ] Scoreboard update skipped (last update: {last_scoreboard_update}, interval: {SCOREBOARD_UPDATE_INTERVAL})"
         )
 
 
 def challenge_creation_hook(challenge):
-    data = event_registry.generate_payload("challenge_created", challenge)
-    send_webhook("challenge_created", data)
+    dispatch_event("challenge_created", challenge)
 
 
 def firstblood_hook(solve):
     # Check if this is the first solve
     solve_count = Solves.query.filter_by(challenge_id=solve.challenge_id).count()
     if solve_count == 1:
-        data = event_registry.generate_payload("firstblood", solve)
-        send_webhook("firstblood", data)
+        dispatch_event("firstblood", solve)
 
 
 def challenge_solved_hook(solve):
-    data = event_registry.generate_payload("challenge_solved", solve)
-    send_webhook("challenge_solved", data)
+    dispatch_event("challenge_solved", solve)
 
 
 def ctf_start_hook():
     if ctf_started():
-        data = event_registry.generate_payload("ctf_started")
-        send_webhook("ctf_started", data)
+        dispatch_event("ctf_started")
 
 
 def team_creation_hook(team):
-    data = event_registry.generate_payload("team_created", team)
-    send_webhook("team_created", data)
+    dispatch_event("team_created", team)
+
+
+def submission_activity_hook(submission):
+    correct = submission.type == "correct"
+    groups = {
+        "challenges": submission.challenge_id,
+        "submitters": submission.account_id,
+    }
+    if correct:
+        groups["challenges_correct"] = submission.challenge_id
+    else:
+        groups["failures"] = (submission.account_id, submission.challenge_id)
+
+    submission_aggregator.record(
+        datetime.utcnow(),
+        totals={"submissions": 1, "correct" if correct else "incorrect": 1},
+        groups=groups,
+    )
+
+    if SUBMISSION_SAMPLE_RATE > 0 and random.random() < SUBMISSION_SAMPLE_RATE:
+        dispatch_event("submission_sampled", submission, SUBMISSION_SAMPLE_RATE)
+
+
+def award_activity_hook(award):
+    award_aggregator.record(
+        datetime.utcnow(),
+        totals={"awards": 1, "points": int(award.value or 0)},
+        groups={"categories": award.category, "recipients": award.account_id},
+    )
+
+
+def window_dispatcher(app, event_type, **kwargs):
+    """Build the on_close callback of an activity aggregator.
+
+    Windows are closed either by a hook, inside a request, or by the aggregator's
+    timer or at exit, outside of any application context.
+
+    Args:
+        app (Flask): The CTFd Flask application instance.
+        event_type (str): The event sent for each closed window.
+        **kwargs: Keyword arguments passed to the payload generator.
+
+    Returns:
+        callable: Dispatches the event for a window summary.
+    """
+
+    def on_close(window):
+        if has_app_context():
+            dispatch_event(event_type, window, **kwargs)
+        else:
+            with app.app_context():
+                dispatch_event(event_type, window, **kwargs)
+
+    return on_close
 
 
 # Wrapper for hooks around solve after_inster event
@@ -112,6 +270,40 @@ def handle_solve_after_insert(mapper, conn, solve):
     )
 
 
+def parse_replay_time(value):
+    """Parse an optional ISO 8601 date used to bound a replay.
+
+    Args:
+        value (str): The date string (e.g., '2025-04-11T12:00'), possibly empty.
+
+    Returns:
+        datetime or None: The parsed date, or None if value is empty.
+    """
+
+    return datetime.fromisoformat(value) if value else None
+
+
+def start_replay(app, config_id, **kwargs):
+    """Replay journaled events to a target in a background thread.
+
+    Args:
+        app (Flask): The CTFd Flask application instance.
+        config_id (str): The ID of the target configuration to replay to.
+        **kwargs: Keyword arguments passed to replay_events.
+
+    Returns:
+        None
+    """
+
+    def run():
+        with app.app_context():
+            target = webhook_config.get_target(config_id)
+            if target is not None:
+                replay_events(target, **kwargs)
+
+    threading.Thread(target=run, daemon=True).start()
+
+
 # -------------------------------------------------------------------------------- LOAD
 
 
@@ -154,57 +346,67 @@ def load(app):
             urls = request.form.getlist("webhook_url")
             secrets = request.form.getlist("hmac_secret")
             config_ids = request.form.getlist("config_id")
-            events = {
-                event_id: request.form.getlist(f"events_{event_id}")
-                for event_id in event_registry.get_events().keys()
+
+            # Index checked boxes by their value (config_id, or URL for new entries)
+            checked = {}
+            for event_id in event_registry.get_events().keys():
+                for value in request.form.getlist(f"events_{event_id}"):
+                    checked.setdefault(value.strip(), set()).add(event_id)
+
+            top_ns = request.form.getlist("scoreboard_top_n")
+            compressions = request.form.getlist("compression")
+            thresholds = request.form.getlist("compression_threshold")
+            max_sizes = request.form.getlist("max_payload_bytes")
+            diff_values = {
+                value.strip() for value in request.form.getlist("scoreboard_diff")
             }
 
-            new_config = {}
+            entries = []
             for i, url in enumerate(urls):
-                if url.strip():
-                    # Use existing config_id or assign new one
-                    config_id = (
-                        config_ids[i]
-                        if i < len(config_ids) and config_ids[i]
-                        else str(webhook_config.next_id)
-                    )
-                    # Determine events for existing vs. new configs
-                    if config_id in webhook_config.urls:
-                        subscribed_events = [
-                            event_id
-                            for event_id, checked_ids in events.items()
-                            if config_id in checked_ids
-                        ]
-                    else:
-                        subscribed_events = [
-                            event_id
-                            for event_id, checked_urls in events.items()
-                            if url in checked_urls
-                        ]
-                        if config_id == str(webhook_config.next_id):
-                            webhook_config.next_id += 1
-
-                    # Store secret if provided
-                    secret = (
-                        secrets[i].strip()
-                        if i < len(secrets) and secrets[i].strip()
-                        else None
+                config_id = config_ids[i] if i < len(config_ids) else ""
+                # Store secret if provided
+                secret = (
+                    secrets[i].strip()
+                    if i < len(secrets) and secrets[i].strip()
+                    else None
+                )
+                top_n = top_ns[i].strip() if i < len(top_ns) else ""
+                compression = compressions[i] if i < len(compressions) else "none"
+                threshold = thresholds[i].strip() if i < len(thresholds) else ""
+                max_size = max_sizes[i].strip() if i < len(max_sizes) else ""
+                entries.append(
+                    (
+                        config_id,
+                        {
+                            "url": url.strip(),
+                            "secret": secret,
+                            "scoreboard_top_n": int(top_n) if top_n.isdigit() else 5,
+                            # Checkbox values are config_ids, or URLs for new entries
+                            "scoreboard_diff": (config_id or url.strip())
+                            in diff_values,
+                            "compression": (
+                                compression if compression in COMPRESSIONS else "none"
+                            ),
+                            "compression_threshold": (
+                                int(threshold) if threshold.isdigit() else 1024
+                            ),
+                            "max_payload_bytes": (
+                                int(max_size) if max_size.isdigit() else 0
+                            ),
+                        },
                     )
-                    new_config[config_id] = {
-                        "url": url.strip(),
-                        "events": subscribed_events,  # Can be empty
-                        "secret": secret,
-                    }
-
-            # Update and save configuration
-            webhook_config.urls = new_config
-            webhook_config.save_config()
+                )
+
+            # Apply only the rows that changed
+            webhook_config.update_targets(entries, checked)
             flash("Webhook configuration updated!", "success")
             return redirect(url_for("webhoogz.webhook_config_route"))
 
+        targets = webhook_config.get_targets()
+
         # Prepare logs for each URL
         logs_by_url = {}
-        for config_id, data in webhook_config.urls.items():
+        for config_id, data in targets.items():
             url = data["url"]
             logs_by_url[url] = (
                 WebhookLog.query.filter_by(config_id=config_id)
@@ -228,9 +430,12 @@ def load(app):
 
         return render_template(
             "webhoogz.html",
-            webhook_config=webhook_config.urls,
+            webhook_config=targets,
             webhook_events=webhook_events_with_wrapper,
             logs_by_url=logs_by_url,
+            compressions=COMPRESSIONS,
+            tracing_enabled=tracer.sample_rate > 0,
+            slow_traces=tracer.get_slowest(10),
         )
 
     @webhooks_bp.route("/admin/webhoogz/delete/<config_id>", methods=["POST"])
@@ -245,19 +450,78 @@ def load(app):
             flask.Response: Redirect to the webhook configuration page.
         """
 
-        if config_id in webhook_config.urls:
-            # Remove associated logs
-            WebhookLog.query.filter_by(config_id=config_id).delete()
-            db.session.commit()
-
-            # Remove config entry
-            del webhook_config.urls[config_id]
-            webhook_config.save_config()
+        # Remove config entry along with its subscriptions and logs
+        if webhook_config.delete_target(config_id):
             flash(f"Webhook configuration {config_id} deleted!", "success")
         else:
             flash(f"Webhook configuration {config_id} not found!", "error")
         return redirect(url_for("webhoogz.webhook_config_route"))
 
+    @webhooks_bp.route("/admin/webhoogz/replay", methods=["POST"])
+    @admins_only
+    def replay_webhook_events():
+        """Replay journaled events to a webhook configuration.
+
+        Reads the target, time range, event types and rate from the form and starts
+        the replay in the background.
+
+        Returns:
+            flask.Response: Redirect to the webhook configuration page.
+        """
+
+        config_id = request.form.get("config_id", "")
+        if webhook_config.get_target(config_id) is None:
+            flash(f"Webhook configuration {config_id} not found!", "error")
+            return redirect(url_for("webhoogz.webhook_config_route"))
+
+        try:
+            start = parse_replay_time(request.form.get("start"))
+            end = parse_replay_time(request.form.get("end"))
+            rate = float(request.form.get("rate") or 10)
+            if rate <= 0:
+                raise ValueError("rate must be positive")
+        except ValueError as e:
+            flash(f"Invalid replay parameters: {e}", "error")
+            return redirect(url_for("webhoogz.webhook_config_route"))
+
+        start_replay(
+            current_app._get_current_object(),
+            config_id,
+            start=start,
+            end=end,
+            event_types=request.form.getlist("replay_events"),
+            rate=rate,
+        )
+        flash(f"Replay to webhook configuration {config_id} started!", "success")
+        return redirect(url_for("webhoogz.webhook_config_route"))
+
+    @app.cli.command("webhoogz-replay")
+    @click.argument("config_id")
+    @click.option("--start", help="Replay events at or after this ISO 8601 date.")
+    @click.option("--end", help="Replay events before this ISO 8601 date.")
+    @click.option(
+        "--event", "event_types", multiple=True, help="Event type to replay."
+    )
+    @click.option(
+        "--rate",
+        default=10.0,
+        type=click.FloatRange(min=0, min_open=True),
+        help="Maximum events sent per second.",
+    )
+    def replay_command(config_id, start, end, event_types, rate):
+        """Replay journaled events to the webhook configuration CONFIG_ID."""
+
+        target = webhook_config.get_target(config_id)
+        if target is None:
+            raise click.ClickException(f"Webhook configuration {config_id} not found")
+        replay_events(
+            target,
+            start=parse_replay_time(start),
+            end=parse_replay_time(end),
+            event_types=list(event_types),
+            rate=rate,
+        )
+
     # Register event listeners for CTFd events
     app.db.event.listen(
         Challenges,
@@ -268,6 +532,24 @@ def load(app):
         Teams, "after_insert", lambda mapper, conn, team: team_creation_hook(team)
     )
     app.db.event.listen(Solves, "after_insert", handle_solve_after_insert)
+    # Submissions covers both Solves and Fails
+    app.db.event.listen(
+        Submissions,
+        "after_insert",
+        lambda mapper, conn, submission: submission_activity_hook(submission),
+        propagate=True,
+    )
+    app.db.event.listen(
+        Awards, "after_insert", lambda mapper, conn, award: award_activity_hook(award)
+    )
+
+    # Send activity windows when they expire, and the open ones at exit
+    submission_aggregator.on_close = window_dispatcher(
+        app, "submission_activity", bruteforce_threshold=BRUTEFORCE_THRESHOLD
+    )
+    award_aggregator.on_close = window_dispatcher(app, "award_activity")
+    atexit.register(submission_aggregator.flush)
+    atexit.register(award_aggregator.flush)
 
     app.register_blueprint(webhooks_bp)
     print("[WEBHOOGZ] Loaded successfully!")
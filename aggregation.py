@@ -0,0 +1,235 @@
+# This file is part of Webhoogz - A CTFd webhook plugin
+#
+# Webhoogz is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import time
+import threading
+
+from collections import Counter
+from datetime import datetime, timezone
+
+
+class SpaceSaving:
+    """Counts the most frequent keys of a stream in bounded memory.
+
+    Implements the Space-Saving algorithm: at most capacity keys are tracked, and
+    when a new key arrives while full, it replaces a least frequent one and inherits
+    its count. The inherited count is kept as the key's error, so count - error is a
+    guaranteed lower bound of the key's true count, and count an upper bound.
+
+    Keys are kept in a stream summary (buckets of keys sharing a count), so adding
+    a key is O(1) whatever the capacity.
+
+    Attributes:
+        capacity (int): Maximum number of keys tracked.
+        counts (dict): Maps tracked keys to their (estimated) counts.
+        errors (dict): Maps tracked keys to the count they inherited.
+    """
+
+    def __init__(self, capacity):
+        """Initialize an empty counter.
+
+        Args:
+            capacity (int): Maximum number of keys tracked.
+        """
+
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        # Maps a count to the keys having it, as an insertion-ordered set
+        self._buckets = {}
+        self._min_count = 0
+
+    def _move(self, key, old_count, new_count):
+        """Move a key between buckets, keeping track of the smallest count."""
+
+        if old_count:
+            bucket = self._buckets[old_count]
+            del bucket[key]
+            if not bucket:
+                del self._buckets[old_count]
+                if self._min_count == old_count:
+                    # Counts only grow by one, so the next smallest is new_count
+                    self._min_count = new_count
+        self._buckets.setdefault(new_count, {})[key] = None
+        if not old_count:
+            self._min_count = min(self._min_count or new_count, new_count)
+        self.counts[key] = new_count
+
+    def add(self, key):
+        """Count one occurrence of a key.
+
+        Args:
+            key: The key to count.
+
+        Returns:
+            None
+        """
+
+        if key in self.counts:
+            self._move(key, self.counts[key], self.counts[key] + 1)
+        elif len(self.counts) < self.capacity:
+            self.errors[key] = 0
+            self._move(key, 0, 1)
+        else:
+            floor = self._min_count
+            victim = next(iter(self._buckets[floor]))
+            del self._buckets[floor][victim]
+            del self.counts[victim]
+            del self.errors[victim]
+            self._buckets[floor][key] = None
+            self.counts[key] = floor
+            self.errors[key] = floor
+            self._move(key, floor, floor + 1)
+
+    def top(self, n=None):
+        """Retrieve the most frequent keys.
+
+        Args:
+            n (int, optional): Maximum number of keys returned. All if omitted.
+
+        Returns:
+            list: (key, count, error) tuples, most frequent first. The true count
+                of a key is between count - error and count.
+        """
+
+        keys = sorted(self.counts, key=self.counts.get, reverse=True)[:n]
+        return [(key, self.counts[key], self.errors[key]) for key in keys]
+
+
+class WindowAggregator:
+    """Aggregates high-rate records into fixed time windows with bounded memory.
+
+    Each record increments named totals and counts keys in named groups. Groups are
+    SpaceSaving counters, so memory is bounded by the number of groups times
+    capacity, whatever the record rate. Windows are aligned on multiples of
+    window_seconds. A timer closes each window when it expires, even if no record
+    follows, and flush() closes the open window early (e.g., at exit). Closed
+    windows are summarized and passed to on_close.
+
+    Attributes:
+        window_seconds (int): Length of a window in seconds.
+        capacity (int): Maximum number of keys tracked per group.
+        on_close (callable or None): Called with the summary of each closed window,
+            outside the aggregator's lock and possibly from a timer thread.
+    """
+
+    def __init__(self, window_seconds=60, capacity=256, on_close=None):
+        """Initialize an aggregator with no open window.
+
+        Args:
+            window_seconds (int): Length of a window in seconds.
+            capacity (int): Maximum number of keys tracked per group.
+            on_close (callable, optional): Called with the summary of each closed
+                window.
+        """
+
+        self.window_seconds = window_seconds
+        self.capacity = capacity
+        self.on_close = on_close
+        self._start = None
+        self._totals = Counter()
+        self._groups = {}
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def record(self, timestamp, totals=None, groups=None):
+        """Add a record to the window containing timestamp.
+
+        If the record belongs to a later window than the open one, the open window
+        is closed first.
+
+        Args:
+            timestamp (datetime): When the record happened (naive UTC).
+            totals (dict, optional): Maps total names to the amount to add.
+            groups (dict, optional): Maps group names to the key to count.
+
+        Returns:
+            None
+        """
+
+        epoch = timestamp.replace(tzinfo=timezone.utc).timestamp()
+        start = int(epoch // self.window_seconds) * self.window_seconds
+        finished = None
+        with self._lock:
+            if self._start is None or start > self._start:
+                if self._start is not None:
+                    finished = self._close()
+                self._open(start)
+
+            self._totals.update(totals or {})
+            for group, key in (groups or {}).items():
+                if group not in self._groups:
+                    self._groups[group] = SpaceSaving(self.capacity)
+                self._groups[group].add(key)
+        self._emit(finished)
+
+    def flush(self):
+        """Close the open window now, if any, without waiting for it to expire.
+
+        Returns:
+            None
+        """
+
+        with self._lock:
+            finished = self._close() if self._start is not None else None
+        self._emit(finished)
+
+    def _expire(self, start):
+        """Close the window starting at start if it is still open."""
+
+        with self._lock:
+            finished = self._close() if self._start == start else None
+        self._emit(finished)
+
+    def _open(self, start):
+        """Open the window starting at start. Must be called with the lock held."""
+
+        self._start = start
+        self._totals = Counter()
+        self._groups = {}
+        delay = start + self.window_seconds - time.time()
+        self._timer = threading.Timer(max(delay, 0), self._expire, args=(start,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _close(self):
+        """Summarize and close the open window. Must be called with the lock held."""
+
+        summary = self._summarize()
+        self._start = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return summary
+
+    def _emit(self, summary):
+        """Pass a closed window's summary to on_close. Called without the lock."""
+
+        if summary is not None and self.on_close is not None:
+            self.on_close(summary)
+
+    def _summarize(self):
+        """Summarize the open window. Must be called with the lock held."""
+
+        return {
+            "window_start": datetime.utcfromtimestamp(self._start).isoformat(),
+            "window_end": datetime.utcfromtimestamp(
+                self._start + self.window_seconds
+            ).isoformat(),
+            "totals": dict(self._totals),
+            "groups": {
+                group: counter.top() for group, counter in self._groups.items()
+            },
+        }
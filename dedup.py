@@ -0,0 +1,99 @@
+# This file is part of Webhoogz - A CTFd webhook plugin
+#
+# Webhoogz is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import time
+import threading
+
+from collections import OrderedDict
+
+
+class DedupCache:
+    """A bounded LRU cache with per-entry TTL used to suppress duplicate events.
+
+    Each check is O(1): entries live in an OrderedDict ordered by insertion, so the
+    least recently seen key is always at the front and can be evicted once the cache
+    reaches max_size. Entries older than ttl seconds are treated as unseen.
+
+    When use_ctfd_cache is set, CTFd's shared cache (e.g. Redis) is consulted
+    instead, so that duplicates are also suppressed across workers.
+
+    Attributes:
+        max_size (int): Maximum number of keys kept in memory.
+        ttl (int): Number of seconds a key is remembered.
+        use_ctfd_cache (bool): Whether to use CTFd's cache backend.
+    """
+
+    def __init__(self, max_size=4096, ttl=600, use_ctfd_cache=False):
+        """Initialize an empty dedup cache.
+
+        Args:
+            max_size (int): Maximum number of keys kept in memory.
+            ttl (int): Number of seconds a key is remembered.
+            use_ctfd_cache (bool): Whether to use CTFd's cache backend.
+        """
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.use_ctfd_cache = use_ctfd_cache
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def seen(self, key):
+        """Check whether a key was already recorded, recording it if not.
+
+        Args:
+            key (str): The deduplication key (usually an event id).
+
+        Returns:
+            bool: True if the key was seen within the TTL, False otherwise.
+        """
+
+        if self.use_ctfd_cache:
+            from CTFd.cache import cache
+
+            # add() only succeeds if the key does not exist yet
+            return not cache.add(f"webhoogz_dedup_{key}", 1, timeout=self.ttl)
+
+        now = time.monotonic()
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is not None and expires > now:
+                self._entries.move_to_end(key)
+                return True
+
+            self._entries[key] = now + self.ttl
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            return False
+
+    def clear(self):
+        """Forget every recorded key."""
+
+        with self._lock:
+            self._entries.clear()
+
+
+dedup_cache = DedupCache(
+    max_size=int(os.getenv("WEBHOOGZ_DEDUP_SIZE", 4096)),
+    ttl=int(os.getenv("WEBHOOGZ_DEDUP_TTL", 600)),
+    use_ctfd_cache=os.getenv("WEBHOOGZ_DEDUP_BACKEND") == "ctfd",
+)
+"""Global instance of DedupCache shared by all webhook hooks.
+
+Configured through the WEBHOOGZ_DEDUP_SIZE, WEBHOOGZ_DEDUP_TTL and
+WEBHOOGZ_DEDUP_BACKEND ("memory" or "ctfd") environment variables.
+"""
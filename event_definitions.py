@@ -16,6 +16,7 @@
 from CTFd.models import Users, Challenges, Teams
 from CTFd.utils.scores import get_standings
 from CTFd.utils import get_app_config
+from CTFd.utils.modes import get_model
 from datetime import datetime
 
 from .events import event_registry
@@ -26,6 +27,7 @@ from .events import event_registry
     "Challenge Created",
     "Triggered when a new challenge is created.",
     {"challenge": "BOF 1", "category": "pwn", "value": 100},
+    key=lambda challenge: challenge.id,
 )
 def generate_challenge_created_payload(challenge):
     return {
@@ -45,6 +47,7 @@ def generate_challenge_created_payload(challenge):
         "challenge": "string",
         "timestamp": "string (ISO)",
     },
+    key=lambda solve: solve.challenge_id,
 )
 def generate_firstblood_payload(solve):
     user = Users.query.filter_by(id=solve.user_id).first()
@@ -67,6 +70,9 @@ def generate_firstblood_payload(solve):
         "challenge": "string",
         "timestamp": "string (ISO)",
     },
+    # Row ids change when a rolled back insert is retried; CTFd keeps
+    # (challenge, account) unique among solves
+    key=lambda solve: (solve.challenge_id, solve.account_id),
 )
 def generate_challenge_solved_payload(solve):
     user = Users.query.filter_by(id=solve.user_id).first()
@@ -89,7 +95,11 @@ def generate_ctf_started_payload():
 @event_registry.event(
     "scoreboard_update",
     "Scoreboard Update",
-    "Triggered when the scoreboard changes (debounced every 5 mins).",
+    "Triggered when the scoreboard changes (debounced every 5 mins). Sends the top N "
+    "entries of each webhook (5 by default, 0 for the full board). Webhooks in diff "
+    "mode instead receive only the entries whose rank or score changed in 'changed', "
+    "the ids that left their top N in 'removed', and nothing when the top N is "
+    "unchanged; 'baseline' is true when the diff is against an empty snapshot.",
     {
         "timestamp": "string (ISO)",
         "total_teams": 50,
@@ -98,11 +108,11 @@ def generate_ctf_started_payload():
         "top_users": [],
     },
 )
-def generate_scoreboard_update_payload(user_id=None, team_id=None):
+def generate_scoreboard_update_payload(user_id=None, team_id=None, top_n=5):
     timestamp = datetime.utcnow().isoformat()
     total_teams = Teams.query.count()
     total_users = Users.query.count()
-    standings = get_standings(count=5)
+    standings = get_standings(count=top_n or None)
     if get_app_config("TEAMS"):
         team_scores = [
             {
@@ -139,6 +149,220 @@ def generate_scoreboard_update_payload(user_id=None, team_id=None):
     "Team Created",
     "Triggered when a new team is created.",
     {"team_name": "string", "timestamp": "string (ISO)"},
+    key=lambda team: team.id,
 )
 def generate_team_created_payload(team):
     return {"team_name": team.name, "timestamp": team.created.isoformat()}
+
+
+def get_account_names(account_ids):
+    """Resolve team or user names (depending on the CTF mode) in one query."""
+
+    Model = get_model()
+    return dict(
+        Model.query.with_entities(Model.id, Model.name)
+        .filter(Model.id.in_(set(account_ids)))
+        .all()
+    )
+
+
+def get_challenges(challenge_ids):
+    """Resolve challenge names and categories in one query."""
+
+    return {
+        challenge_id: (name, category)
+        for challenge_id, name, category in Challenges.query.with_entities(
+            Challenges.id, Challenges.name, Challenges.category
+        )
+        .filter(Challenges.id.in_(set(challenge_ids)))
+        .all()
+    }
+
+
+@event_registry.event(
+    "submission_activity",
+    "Submission Activity",
+    "Aggregated flag submissions, sent once per window instead of once per "
+    "submission. Counts per challenge and category, the most active accounts, and "
+    "accounts with many incorrect submissions on one challenge (brute-force "
+    "suspects). Per-key counts are exact unless more keys were seen in the window "
+    "than are tracked, in which case they may be overestimated. Suspects are only "
+    "listed when their count is guaranteed, and 'incorrect' is then a lower bound.",
+    {
+        "window_start": "string (ISO)",
+        "window_end": "string (ISO)",
+        "submissions": 120,
+        "correct": 8,
+        "incorrect": 112,
+        "challenges": [
+            {
+                "challenge_id": 1,
+                "challenge": "BOF 1",
+                "category": "pwn",
+                "submissions": 60,
+                "correct": 3,
+            }
+        ],
+        "categories": [{"category": "pwn", "submissions": 60, "correct": 3}],
+        "top_submitters": [{"account_id": 4, "name": "string", "submissions": 40}],
+        "bruteforce_suspects": [
+            {
+                "account_id": 4,
+                "name": "string",
+                "challenge_id": 1,
+                "challenge": "BOF 1",
+                "incorrect": 35,
+            }
+        ],
+    },
+)
+def generate_submission_activity_payload(window, top_n=10, bruteforce_threshold=20):
+    totals = window["totals"]
+    groups = window["groups"]
+    by_challenge = groups.get("challenges", [])
+    correct_by_challenge = {
+        challenge_id: count
+        for challenge_id, count, _ in groups.get("challenges_correct", [])
+    }
+    top_submitters = groups.get("submitters", [])[:top_n]
+    # Counts may include those inherited from evicted keys, so only accounts whose
+    # guaranteed count (count - error) reaches the threshold are reported
+    suspects = sorted(
+        (
+            (key, count - error)
+            for key, count, error in groups.get("failures", [])
+            if count - error >= bruteforce_threshold
+        ),
+        key=lambda suspect: suspect[1],
+        reverse=True,
+    )[:top_n]
+
+    challenges = get_challenges(
+        [challenge_id for challenge_id, _, _ in by_challenge]
+        + [challenge_id for (_, challenge_id), _ in suspects]
+    )
+
+    # Categories are derived from per-challenge counts rather than tracked per
+    # submission, which would need a challenge lookup for every submission
+    by_category = {}
+    for challenge_id, count, _ in by_challenge:
+        category = challenges.get(challenge_id, (None, None))[1]
+        submissions, correct = by_category.get(category, (0, 0))
+        by_category[category] = (
+            submissions + count,
+            correct + correct_by_challenge.get(challenge_id, 0),
+        )
+
+    names = get_account_names(
+        [account_id for account_id, _, _ in top_submitters]
+        + [account_id for (account_id, _), _ in suspects]
+    )
+    return {
+        "window_start": window["window_start"],
+        "window_end": window["window_end"],
+        "submissions": totals.get("submissions", 0),
+        "correct": totals.get("correct", 0),
+        "incorrect": totals.get("incorrect", 0),
+        "challenges": [
+            {
+                "challenge_id": challenge_id,
+                "challenge": challenges.get(challenge_id, (None, None))[0],
+                "category": challenges.get(challenge_id, (None, None))[1],
+                "submissions": count,
+                "correct": correct_by_challenge.get(challenge_id, 0),
+            }
+            for challenge_id, count, _ in by_challenge[:top_n]
+        ],
+        "categories": [
+            {"category": category, "submissions": submissions, "correct": correct}
+            for category, (submissions, correct) in sorted(
+                by_category.items(), key=lambda item: item[1][0], reverse=True
+            )[:top_n]
+        ],
+        "top_submitters": [
+            {
+                "account_id": account_id,
+                "name": names.get(account_id),
+                "submissions": count,
+            }
+            for account_id, count, _ in top_submitters
+        ],
+        "bruteforce_suspects": [
+            {
+                "account_id": account_id,
+                "name": names.get(account_id),
+                "challenge_id": challenge_id,
+                "challenge": challenges.get(challenge_id, (None, None))[0],
+                "incorrect": count,
+            }
+            for (account_id, challenge_id), count in suspects
+        ],
+    }
+
+
+@event_registry.event(
+    "award_activity",
+    "Award Activity",
+    "Aggregated awards, sent once per window instead of once per award.",
+    {
+        "window_start": "string (ISO)",
+        "window_end": "string (ISO)",
+        "awards": 12,
+        "points": 350,
+        "categories": [{"category": "string", "awards": 5}],
+        "top_recipients": [{"account_id": 4, "name": "string", "awards": 3}],
+    },
+)
+def generate_award_activity_payload(window, top_n=10):
+    totals = window["totals"]
+    groups = window["groups"]
+    top_recipients = groups.get("recipients", [])[:top_n]
+    names = get_account_names([account_id for account_id, _, _ in top_recipients])
+    return {
+        "window_start": window["window_start"],
+        "window_end": window["window_end"],
+        "awards": totals.get("awards", 0),
+        "points": totals.get("points", 0),
+        "categories": [
+            {"category": category, "awards": count}
+            for category, count, _ in groups.get("categories", [])[:top_n]
+        ],
+        "top_recipients": [
+            {"account_id": account_id, "name": names.get(account_id), "awards": count}
+            for account_id, count, _ in top_recipients
+        ],
+    }
+
+
+@event_registry.event(
+    "submission_sampled",
+    "Submission (Sampled)",
+    "A random sample of individual flag submissions. Only sent when "
+    "SUBMISSION_SAMPLE_RATE is above 0; 'sample_rate' gives the probability that "
+    "any submission is sent.",
+    {
+        "challenge": "string",
+        "category": "string",
+        "account_id": 4,
+        "correct": True,
+        "timestamp": "string (ISO)",
+        "sample_rate": 0.01,
+    },
+    # Correct submissions are identified like solves; nothing more stable than the
+    # row id identifies an incorrect one
+    key=lambda submission, sample_rate: (
+        (submission.challenge_id, submission.account_id)
+        if submission.type == "correct"
+        else submission.id
+    ),
+)
+def generate_submission_sampled_payload(submission, sample_rate):
+    challenge = Challenges.query.filter_by(id=submission.challenge_id).first()
+    return {
+        "challenge": challenge.name,
+        "category": challenge.category,
+        "account_id": submission.account_id,
+        "correct": submission.type == "correct",
+        "timestamp": submission.date.isoformat(),
+        "sample_rate": sample_rate,
+    }
@@ -13,9 +13,14 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import uuid
+
 from functools import wraps
 
 
+EVENT_ID_NAMESPACE = uuid.UUID("5f0c1d2e-7a4b-4c8e-9b1f-3e6d2a9c8b70")
+
+
 class WebhookEventRegistry:
     """A registry for managing webhook events with metadata and payload generators.
 
@@ -34,7 +39,13 @@ class WebhookEventRegistry:
         self.events = {}
 
     def register(
-        self, event_id, display_name, description, sample_data, generate_payload
+        self,
+        event_id,
+        display_name,
+        description,
+        sample_data,
+        generate_payload,
+        key=None,
     ):
         """Register a new webhook event with metadata.
 
@@ -44,6 +55,9 @@ class WebhookEventRegistry:
             description (str): Detailed description of the event's purpose.
             sample_data (dict): Example data structure for the event payload.
             generate_payload (callable): Function to generate the event's payload.
+            key (callable, optional): Function taking the same arguments as
+                generate_payload and returning a value that identifies the
+                occurrence (e.g. a solve id). Used to derive a stable event id.
 
         Returns:
             None
@@ -54,6 +68,7 @@ class WebhookEventRegistry:
             "description": description,
             "sample_data": sample_data,
             "generate_payload": generate_payload,
+            "key": key,
         }
 
     def get_events(self):
@@ -83,7 +98,30 @@ class WebhookEventRegistry:
             return self.events[event_id]["generate_payload"](*args, **kwargs)
         raise ValueError(f"Event {event_id} not found or has no payload generator")
 
-    def event(self, event_id, display_name, description, sample_data):
+    def get_event_id(self, event_id, *args, **kwargs):
+        """Compute the unique id of an occurrence of a registered event.
+
+        Events registered with a key function get a stable UUID derived from the
+        event type and the key, so the same occurrence (e.g. the same solve) always
+        maps to the same id. Other events get a random UUID.
+
+        Args:
+            event_id (str): The ID of the event type.
+            *args: Positional arguments to pass to the key function.
+            **kwargs: Keyword arguments to pass to the key function.
+
+        Returns:
+            str: The event id as a UUID string.
+        """
+
+        key = self.events.get(event_id, {}).get("key")
+        if key is None:
+            return str(uuid.uuid4())
+        return str(
+            uuid.uuid5(EVENT_ID_NAMESPACE, f"{event_id}:{key(*args, **kwargs)}")
+        )
+
+    def event(self, event_id, display_name, description, sample_data, key=None):
         """Decorator to register a webhook event.
 
         Args:
@@ -91,6 +129,8 @@ class WebhookEventRegistry:
             display_name (str): Human-readable name for the event.
             description (str): Detailed description of the event's purpose.
             sample_data (dict): Example data structure for the event payload.
+            key (callable, optional): Function identifying an occurrence of the
+                event, used to derive a stable event id.
 
         Returns:
             callable: A decorator that registers the decorated function as the
@@ -112,7 +152,9 @@ class WebhookEventRegistry:
             def wrapper(*args, **kwargs):
                 return func(*args, **kwargs)
 
-            self.register(event_id, display_name, description, sample_data, wrapper)
+            self.register(
+                event_id, display_name, description, sample_data, wrapper, key=key
+            )
             return wrapper
 
         return decorator
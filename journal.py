@@ -0,0 +1,158 @@
+# This file is part of Webhoogz - A CTFd webhook plugin
+#
+# Webhoogz is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+import time
+import zlib
+
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from .models import JOURNAL_MAX_BYTES, WebhookEvent
+from .webhooks import get_log_session, send_webhook
+
+
+def record_event(event_id, event_type, data):
+    """Append a generated event to the journal.
+
+    The data is stored as zlib-compressed compact JSON. Recording the same event id
+    twice is a no-op, so each event is journaled once. Events whose compressed data
+    exceeds JOURNAL_MAX_BYTES are not journaled. Database errors are logged and
+    swallowed: this runs inside CTFd's flush, and journaling must never fail the
+    submission that triggered the event.
+
+    Args:
+        event_id (str): Unique id of the event occurrence.
+        event_type (str): The type of the event (e.g., 'challenge_solved').
+        data (dict): The event data, as sent in the webhook payload.
+
+    Returns:
+        None
+    """
+
+    body = zlib.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+    if len(body) > JOURNAL_MAX_BYTES:
+        print(
+            f"[WEBHOOGZ] {event_type} event {event_id} is too large to journal "
+            f"({len(body)} bytes)"
+        )
+        return
+
+    log_session = get_log_session()
+    try:
+        log_session.add(
+            WebhookEvent(
+                event_id=event_id,
+                event_type=event_type,
+                data=body,
+                timestamp=datetime.utcnow(),
+            )
+        )
+        log_session.commit()
+    except IntegrityError:
+        log_session.rollback()
+    except SQLAlchemyError as e:
+        log_session.rollback()
+        print(f"[WEBHOOGZ] Journal error for {event_type} event {event_id}: {e}")
+    finally:
+        log_session.close()
+
+
+def iter_events(start=None, end=None, event_types=None, chunk_size=500):
+    """Stream journaled events in chronological order.
+
+    Rows are fetched in chunks of chunk_size using keyset pagination on the primary
+    key, so memory use does not depend on the size of the range.
+
+    Args:
+        start (datetime, optional): Only include events at or after this time.
+        end (datetime, optional): Only include events before this time.
+        event_types (list, optional): Only include these event types.
+        chunk_size (int): Number of rows fetched per query.
+
+    Yields:
+        tuple: (event_id, event_type, data) for each matching event.
+    """
+
+    last_id = 0
+    while True:
+        log_session = get_log_session()
+        try:
+            query = log_session.query(
+                WebhookEvent.id,
+                WebhookEvent.event_id,
+                WebhookEvent.event_type,
+                WebhookEvent.data,
+            ).filter(WebhookEvent.id > last_id)
+            if start is not None:
+                query = query.filter(WebhookEvent.timestamp >= start)
+            if end is not None:
+                query = query.filter(WebhookEvent.timestamp < end)
+            if event_types:
+                query = query.filter(WebhookEvent.event_type.in_(event_types))
+            rows = query.order_by(WebhookEvent.id).limit(chunk_size).all()
+        finally:
+            log_session.close()
+
+        for row_id, event_id, event_type, data in rows:
+            last_id = row_id
+            yield event_id, event_type, json.loads(zlib.decompress(data))
+
+        if len(rows) < chunk_size:
+            return
+
+
+def replay_events(
+    target, start=None, end=None, event_types=None, rate=10.0, chunk_size=500
+):
+    """Re-send journaled events to a single webhook target at a controlled rate.
+
+    Events keep their original id, so receivers that deduplicate on
+    X-Webhoogz-Event-Id can safely receive a replay overlapping live traffic.
+
+    Args:
+        target (WebhookTarget): The target to send events to.
+        start (datetime, optional): Only replay events at or after this time.
+        end (datetime, optional): Only replay events before this time.
+        event_types (list, optional): Only replay these event types.
+        rate (float): Maximum number of events sent per second. Must be positive.
+        chunk_size (int): Number of journal rows fetched per query.
+
+    Returns:
+        int: The number of events replayed.
+
+    Raises:
+        ValueError: If rate is not positive.
+    """
+
+    if not rate or rate <= 0:
+        raise ValueError("Replay rate must be positive")
+
+    interval = 1.0 / rate
+    next_send = time.monotonic()
+    count = 0
+    for event_id, event_type, data in iter_events(
+        start, end, event_types, chunk_size
+    ):
+        delay = next_send - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        next_send = max(next_send, time.monotonic()) + interval
+
+        send_webhook(event_type, data, event_id=event_id, targets=[target])
+        count += 1
+
+    print(f"[WEBHOOGZ] Replayed {count} events to {target.url}")
+    return count
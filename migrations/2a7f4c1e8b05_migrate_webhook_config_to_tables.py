@@ -0,0 +1,107 @@
+"""Migrate the WEBHOOK_CONFIG blob to the webhook target tables
+
+Revision ID: 2a7f4c1e8b05
+Revises:
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+import json
+
+import sqlalchemy as sa
+
+from CTFd.plugins.migrations import get_columns_for_table
+
+# revision identifiers, used by Alembic.
+revision = "2a7f4c1e8b05"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+config_table = sa.table(
+    "config", sa.column("key", sa.Text), sa.column("value", sa.Text)
+)
+log_table = sa.table("webhook_log", sa.column("config_id", sa.Integer))
+subscription_table = sa.table(
+    "webhook_subscription",
+    sa.column("target_id", sa.Integer),
+    sa.column("event_id", sa.String),
+)
+
+# Defaults of the target settings, for tables created with those columns
+TARGET_DEFAULTS = {
+    "scoreboard_top_n": 5,
+    "scoreboard_diff": False,
+    "compression": "none",
+    "compression_threshold": 1024,
+    "max_payload_bytes": 0,
+}
+
+
+def upgrade(op=None):
+    conn = op.get_bind()
+    config = conn.execute(
+        sa.select([config_table.c.value]).where(
+            config_table.c.key == "WEBHOOK_CONFIG"
+        )
+    ).scalar()
+    if not config:
+        return
+
+    # Claim the blob first: if another worker migrated it concurrently, the
+    # conditional update matches no row and nothing is inserted twice
+    claimed = conn.execute(
+        config_table.update()
+        .where(config_table.c.key == "WEBHOOK_CONFIG")
+        .where(config_table.c.value == config)
+        .values(value="")
+    )
+    if claimed.rowcount != 1:
+        return
+
+    columns = get_columns_for_table(
+        op=op, table_name="webhook_target", names_only=True
+    )
+    target_table = sa.table(
+        "webhook_target",
+        sa.column("id", sa.Integer),
+        sa.column("url", sa.String),
+        sa.column("secret", sa.String),
+        *[sa.column(name) for name in TARGET_DEFAULTS if name in columns],
+    )
+    defaults = {
+        name: value for name, value in TARGET_DEFAULTS.items() if name in columns
+    }
+
+    legacy = json.loads(config)
+    # Park logs on negative ids first so old and new ids never collide
+    for old_id in legacy.keys():
+        conn.execute(
+            log_table.update()
+            .where(log_table.c.config_id == int(old_id))
+            .values(config_id=-int(old_id))
+        )
+
+    for old_id, data in sorted(legacy.items(), key=lambda item: int(item[0])):
+        result = conn.execute(
+            target_table.insert().values(
+                url=data["url"], secret=data.get("secret"), **defaults
+            )
+        )
+        target_id = result.inserted_primary_key[0]
+        for event_id in set(data.get("events", [])):
+            conn.execute(
+                subscription_table.insert().values(
+                    target_id=target_id, event_id=event_id
+                )
+            )
+        conn.execute(
+            log_table.update()
+            .where(log_table.c.config_id == -int(old_id))
+            .values(config_id=target_id)
+        )
+
+    print(f"[WEBHOOGZ] Migrated {len(legacy)} webhook configurations to tables")
+
+
+def downgrade(op=None):
+    pass
@@ -0,0 +1,37 @@
+"""Add scoreboard settings to webhook targets
+
+Revision ID: 4b1e7c2a9d3f
+Revises: 2a7f4c1e8b05
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+import sqlalchemy as sa
+
+from CTFd.plugins.migrations import get_columns_for_table
+
+# revision identifiers, used by Alembic.
+revision = "4b1e7c2a9d3f"
+down_revision = "2a7f4c1e8b05"
+branch_labels = None
+depends_on = None
+
+
+def upgrade(op=None):
+    columns = get_columns_for_table(
+        op=op, table_name="webhook_target", names_only=True
+    )
+    if "scoreboard_top_n" not in columns:
+        op.add_column(
+            "webhook_target",
+            sa.Column("scoreboard_top_n", sa.Integer(), server_default="5"),
+        )
+    if "scoreboard_diff" not in columns:
+        op.add_column(
+            "webhook_target",
+            sa.Column("scoreboard_diff", sa.Boolean(), server_default=sa.false()),
+        )
+
+
+def downgrade(op=None):
+    op.drop_column("webhook_target", "scoreboard_diff")
+    op.drop_column("webhook_target", "scoreboard_top_n")
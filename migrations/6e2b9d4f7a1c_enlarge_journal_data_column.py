@@ -0,0 +1,35 @@
+"""Enlarge the journal data column beyond 64 KB on MySQL
+
+Revision ID: 6e2b9d4f7a1c
+Revises: 9c3d5e8f1a2b
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "6e2b9d4f7a1c"
+down_revision = "9c3d5e8f1a2b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade(op=None):
+    # Other backends store binary data without a size limit
+    if op.get_bind().dialect.name == "mysql":
+        op.alter_column(
+            "webhook_event",
+            "data",
+            type_=sa.LargeBinary(length=2**24 - 1),
+            existing_nullable=False,
+        )
+
+
+def downgrade(op=None):
+    if op.get_bind().dialect.name == "mysql":
+        op.alter_column(
+            "webhook_event",
+            "data",
+            type_=sa.LargeBinary(),
+            existing_nullable=False,
+        )
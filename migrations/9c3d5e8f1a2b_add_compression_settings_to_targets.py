@@ -0,0 +1,43 @@
+"""Add compression and payload budget settings to webhook targets
+
+Revision ID: 9c3d5e8f1a2b
+Revises: 4b1e7c2a9d3f
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+import sqlalchemy as sa
+
+from CTFd.plugins.migrations import get_columns_for_table
+
+# revision identifiers, used by Alembic.
+revision = "9c3d5e8f1a2b"
+down_revision = "4b1e7c2a9d3f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade(op=None):
+    columns = get_columns_for_table(
+        op=op, table_name="webhook_target", names_only=True
+    )
+    if "compression" not in columns:
+        op.add_column(
+            "webhook_target",
+            sa.Column("compression", sa.String(length=10), server_default="none"),
+        )
+    if "compression_threshold" not in columns:
+        op.add_column(
+            "webhook_target",
+            sa.Column("compression_threshold", sa.Integer(), server_default="1024"),
+        )
+    if "max_payload_bytes" not in columns:
+        op.add_column(
+            "webhook_target",
+            sa.Column("max_payload_bytes", sa.Integer(), server_default="0"),
+        )
+
+
+def downgrade(op=None):
+    op.drop_column("webhook_target", "max_payload_bytes")
+    op.drop_column("webhook_target", "compression_threshold")
+    op.drop_column("webhook_target", "compression")
@@ -33,3 +33,72 @@ class WebhookLog(db.Model):
     response_code = db.Column(db.Integer)
     error_message = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class WebhookTarget(db.Model):
+    """A database model for a webhook target URL in CTFd.
+
+    Each target is one configured receiver, identified by its id (the config_id used
+    throughout the plugin), with an optional HMAC secret and per-target delivery
+    settings. The events it receives are stored as WebhookSubscription rows.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(255), nullable=False)
+    secret = db.Column(db.String(255))
+    # Number of scoreboard entries sent in scoreboard_update (0 for the full board)
+    scoreboard_top_n = db.Column(db.Integer, default=5)
+    # Send only rank/score changes since the previous scoreboard_update
+    scoreboard_diff = db.Column(db.Boolean, default=False)
+    # Request body compression: "none", "gzip" or "zstd"
+    compression = db.Column(db.String(10), default="none")
+    # Bodies smaller than this many bytes are sent uncompressed
+    compression_threshold = db.Column(db.Integer, default=1024)
+    # Bodies larger than this many bytes are split or truncated (0 for no limit)
+    max_payload_bytes = db.Column(db.Integer, default=0)
+    subscriptions = db.relationship(
+        "WebhookSubscription",
+        backref="target",
+        cascade="all, delete-orphan",
+        lazy="select",
+    )
+
+
+class WebhookSubscription(db.Model):
+    """A database model linking a webhook target to an event it receives.
+
+    Indexed by event_id so that the targets of an event can be looked up without
+    scanning every configuration.
+    """
+
+    __table_args__ = (db.UniqueConstraint("target_id", "event_id"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    target_id = db.Column(
+        db.Integer,
+        db.ForeignKey("webhook_target.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    event_id = db.Column(db.String(50), nullable=False, index=True)
+
+
+# Size of the journal data column, in bytes (MEDIUMBLOB on MySQL/MariaDB)
+JOURNAL_MAX_BYTES = 2**24 - 1
+
+
+class WebhookEvent(db.Model):
+    """A database model for the append-only journal of generated webhook events.
+
+    Each generated event is stored once, independently of the targets it was sent
+    to, so that it can later be replayed. The data is kept as zlib-compressed compact
+    JSON to keep the journal small. It is bounded by JOURNAL_MAX_BYTES (16 MB, a
+    MEDIUMBLOB on MySQL/MariaDB, where an unsized BLOB only holds 64 KB); larger
+    events are not journaled.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.String(36), nullable=False, unique=True)
+    event_type = db.Column(db.String(50), nullable=False, index=True)
+    data = db.Column(db.LargeBinary(length=JOURNAL_MAX_BYTES), nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
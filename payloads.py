@@ -0,0 +1,205 @@
+# This file is part of Webhoogz - A CTFd webhook plugin
+#
+# Webhoogz is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import gzip
+import json
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+# Room left in a budget for the "part"/"parts" fields added to split payloads
+PART_FIELDS_MARGIN = 32
+
+
+def encode_json(payload):
+    """Serialize a payload compactly, as signed and sent to webhooks.
+
+    Args:
+        payload (dict): The webhook payload.
+
+    Returns:
+        bytes: The UTF-8 encoded compact JSON.
+    """
+
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def compress_body(body, compression, threshold=0):
+    """Compress a request body if it is large enough.
+
+    Falls back to gzip when zstd is requested but the zstandard package is not
+    installed.
+
+    Args:
+        body (bytes): The uncompressed body.
+        compression (str): One of COMPRESSIONS.
+        threshold (int): Bodies smaller than this many bytes are left as is.
+
+    Returns:
+        tuple: (body, content_encoding), where content_encoding is None if the
+            body was not compressed.
+    """
+
+    if compression not in ("gzip", "zstd") or len(body) < threshold:
+        return body, None
+
+    if compression == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor().compress(body), "zstd"
+    if compression == "zstd":
+        print("[WEBHOOGZ] zstandard is not installed, falling back to gzip")
+    return gzip.compress(body), "gzip"
+
+
+def truncate_data(data):
+    """Drop the list and object fields of an event's data, keeping scalars.
+
+    Args:
+        data (dict): The event data.
+
+    Returns:
+        dict: The data without its nested fields.
+    """
+
+    return {
+        key: value
+        for key, value in data.items()
+        if not isinstance(value, (list, dict))
+    }
+
+
+def split_data(data, fits):
+    """Split an event's data into parts that each fit a size budget.
+
+    The largest list field is halved until every part fits. The other list fields
+    go to the first half only, so every list element is sent in exactly one part,
+    and concatenating each list field across the parts, in order, rebuilds data.
+    Scalar fields are repeated in every part, and neighbouring parts are merged
+    back together while they fit. If a part still does not fit once it cannot be
+    split further (e.g., a single oversized list element), splitting is abandoned
+    and the data is sent as one truncated part instead.
+
+    Args:
+        data (dict): The event data.
+        fits (callable): Returns whether a data dict fits the budget, and whether
+            it had to be truncated, given (data, truncated).
+
+    Returns:
+        list: (data, truncated) tuples, in order.
+    """
+
+    def split(data):
+        if fits(data, False):
+            return [(data, False)]
+
+        lists = [key for key, value in data.items() if isinstance(value, list)]
+        if sum(len(data[key]) for key in lists) <= 1:
+            return None
+
+        key = max(lists, key=lambda key: len(data[key]))
+        middle = len(data[key]) // 2
+        first = split({**data, key: data[key][:middle]})
+        if first is None:
+            return None
+        second = split(
+            {
+                **data,
+                **{other: [] for other in lists},
+                key: data[key][middle:],
+            }
+        )
+        return first + second if second else None
+
+    parts = split(data)
+    if parts is not None:
+        # Halving leaves parts well under the budget; merge neighbours while they fit
+        merged = [parts[0][0]]
+        for part, _ in parts[1:]:
+            candidate = {
+                key: merged[-1][key] + value if isinstance(value, list) else value
+                for key, value in part.items()
+            }
+            if fits(candidate, False):
+                merged[-1] = candidate
+            else:
+                merged.append(part)
+        return [(part, False) for part in merged]
+
+    truncated = truncate_data(data)
+    return [(truncated if fits(truncated, True) else {}, True)]
+
+
+def build_bodies(payload, compression="none", threshold=0, max_bytes=0):
+    """Build the request bodies sent for a payload with given delivery settings.
+
+    Oversized payloads are split (or truncated) so that each body, as sent after
+    compression, is at most max_bytes. Parts carry "part" and "parts" fields, and
+    truncated payloads a "truncated" field.
+
+    Args:
+        payload (dict): The webhook payload, with "id", "event" and "data".
+        compression (str): One of COMPRESSIONS.
+        threshold (int): Bodies smaller than this many bytes are not compressed.
+        max_bytes (int): Maximum size of a body in bytes, or 0 for no limit.
+
+    Returns:
+        list: (body, content_encoding) tuples, one per request to send.
+
+    Raises:
+        ValueError: If max_bytes cannot fit even the payload without its data.
+    """
+
+    body = compress_body(encode_json(payload), compression, threshold)
+    if not max_bytes or len(body[0]) <= max_bytes:
+        return [body]
+
+    def wrap(data, truncated, part=1, parts=1):
+        wrapped = {**payload, "data": data}
+        if parts > 1:
+            wrapped.update(part=part, parts=parts)
+        if truncated:
+            wrapped["truncated"] = True
+        return wrapped
+
+    def size(data, truncated):
+        wrapped = compress_body(
+            encode_json(wrap(data, truncated)), compression, threshold
+        )
+        return len(wrapped[0])
+
+    envelope = size({}, True)
+    if max_bytes <= envelope + PART_FIELDS_MARGIN:
+        raise ValueError(
+            f"max_bytes must be above {envelope + PART_FIELDS_MARGIN} "
+            f"for {payload['event']} events"
+        )
+
+    parts = split_data(
+        payload["data"],
+        lambda data, truncated: size(data, truncated)
+        <= max_bytes - PART_FIELDS_MARGIN,
+    )
+    return [
+        compress_body(
+            encode_json(wrap(data, truncated, i + 1, len(parts))),
+            compression,
+            threshold,
+        )
+        for i, (data, truncated) in enumerate(parts)
+    ]
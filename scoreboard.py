@@ -0,0 +1,169 @@
+# This file is part of Webhoogz - A CTFd webhook plugin
+#
+# Webhoogz is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from array import array
+
+
+def get_entries(data):
+    """Return the ranked entries of a scoreboard_update payload.
+
+    Args:
+        data (dict): A scoreboard_update payload.
+
+    Returns:
+        list: The top_teams entries in teams mode, the top_users entries otherwise.
+    """
+
+    return data["top_teams"] or data["top_users"]
+
+
+def get_account_id(entry):
+    """Return the team or user id of a scoreboard entry.
+
+    Args:
+        entry (dict): An entry of top_teams or top_users.
+
+    Returns:
+        int: The team_id or user_id of the entry.
+    """
+
+    return entry["team_id"] if "team_id" in entry else entry["user_id"]
+
+
+def slice_scoreboard(data, top_n):
+    """Restrict a scoreboard_update payload to its first top_n entries.
+
+    Args:
+        data (dict): A scoreboard_update payload.
+        top_n (int): Number of entries to keep, or 0 to keep all of them.
+
+    Returns:
+        dict: The payload with top_teams and top_users truncated.
+    """
+
+    if not top_n:
+        return data
+    return {
+        **data,
+        "top_teams": data["top_teams"][:top_n],
+        "top_users": data["top_users"][:top_n],
+    }
+
+
+class ScoreboardSnapshots:
+    """Keeps the last scoreboard sent to each webhook target to compute diffs.
+
+    Snapshots live in CTFd's cache (Redis or the filesystem cache), which every
+    worker shares, so a diff is always computed against the last scoreboard sent
+    to the target by any worker. They are stored compactly as a flat array of
+    (account_id, score) pairs in rank order, 16 bytes per entry.
+
+    Each snapshot carries a sequence number. Diffs include their own sequence and
+    the base_sequence they apply to, so a receiver that did not see base_sequence
+    last knows its board is out of sync and should wait for the next baseline.
+    A baseline is sent every baseline_every diffs so that such receivers recover.
+
+    Attributes:
+        baseline_every (int): Number of diffs between two forced baselines.
+    """
+
+    def __init__(self, baseline_every=12):
+        """Initialize a snapshot store.
+
+        Args:
+            baseline_every (int): Number of diffs between two forced baselines.
+        """
+
+        self.baseline_every = baseline_every
+
+    @staticmethod
+    def _key(config_id):
+        return f"webhoogz_scoreboard_{config_id}"
+
+    def diff(self, config_id, data, top_n):
+        """Compute the scoreboard changes for a target and store the new snapshot.
+
+        Args:
+            config_id (int): The ID of the target configuration.
+            data (dict): A scoreboard_update payload with at least top_n entries.
+            top_n (int): Number of entries the target follows, or 0 for all.
+
+        Returns:
+            dict or None: A diff payload with the entries whose rank or score changed
+                and the ids that left the top N, or None if nothing changed.
+        """
+
+        from CTFd.cache import cache
+
+        entries = get_entries(slice_scoreboard(data, top_n))
+        snapshot = array("q")
+        for entry in entries:
+            snapshot.extend((get_account_id(entry), entry["score"]))
+
+        stored = cache.get(self._key(config_id))
+        base_sequence, previous = None, None
+        if stored is not None:
+            base_sequence, previous_bytes = stored
+            if base_sequence % self.baseline_every:
+                previous = array("q")
+                previous.frombytes(previous_bytes)
+
+        baseline = previous is None
+        old = {}
+        if not baseline:
+            for i in range(0, len(previous), 2):
+                old[previous[i]] = (i // 2 + 1, previous[i + 1])
+
+        changed = [
+            entry
+            for entry in entries
+            if old.get(get_account_id(entry)) != (entry["rank"], entry["score"])
+        ]
+        current = set(snapshot[0::2])
+        removed = [account_id for account_id in old if account_id not in current]
+        if not baseline and not changed and not removed:
+            return None
+
+        sequence = (base_sequence or 0) + 1
+        cache.set(self._key(config_id), (sequence, snapshot.tobytes()), timeout=0)
+        return {
+            "timestamp": data["timestamp"],
+            "total_teams": data["total_teams"],
+            "total_users": data["total_users"],
+            "top_n": top_n,
+            "baseline": baseline,
+            "sequence": sequence,
+            "base_sequence": None if baseline else base_sequence,
+            "changed": changed,
+            "removed": removed,
+        }
+
+    def forget(self, config_id):
+        """Drop the snapshot of a target, so its next diff is a full baseline.
+
+        Args:
+            config_id (int): The ID of the target configuration.
+
+        Returns:
+            None
+        """
+
+        from CTFd.cache import cache
+
+        cache.delete(self._key(config_id))
+
+
+scoreboard_snapshots = ScoreboardSnapshots()
+"""Global instance of ScoreboardSnapshots shared by scoreboard_update hooks."""
@@ -0,0 +1,379 @@
+# This file is part of Webhoogz - A CTFd webhook plugin
+#
+# Webhoogz is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import json
+import time
+import uuid
+import queue
+import random
+import threading
+import requests
+
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+_current_trace = ContextVar("webhoogz_trace", default=None)
+
+
+class Span:
+    """A timed stage of an event's delivery.
+
+    Attributes:
+        name (str): Name of the stage (e.g., 'http').
+        span_id (str): 16 hex digit span id.
+        parent_id (str or None): Span id of the parent span.
+        attributes (dict): Extra data about the stage (e.g., config_id).
+        start_ns (int): Start time in nanoseconds since the epoch.
+        end_ns (int or None): End time in nanoseconds since the epoch.
+    """
+
+    __slots__ = ("name", "span_id", "parent_id", "attributes", "start_ns", "end_ns")
+
+    def __init__(self, name, parent_id=None, attributes=None):
+        """Start a new span.
+
+        Args:
+            name (str): Name of the stage.
+            parent_id (str, optional): Span id of the parent span.
+            attributes (dict, optional): Extra data about the stage.
+        """
+
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def end(self):
+        """Stop the span's clock."""
+
+        self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self):
+        """float: Duration of the span in milliseconds."""
+
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+
+class Trace:
+    """All spans recorded for one event, from the hook to the last HTTP response.
+
+    The trace id is the event id, so traces can be matched with the
+    X-Webhoogz-Event-Id header seen by receivers.
+
+    Attributes:
+        trace_id (str): 32 hex digit trace id.
+        event_id (str): The id of the traced event.
+        event_type (str): The type of the traced event.
+        root (Span): The span covering the whole dispatch.
+        spans (list): Every span of the trace, root first.
+    """
+
+    def __init__(self, event_id, event_type):
+        """Start a new trace with its root span.
+
+        Args:
+            event_id (str): The id of the traced event.
+            event_type (str): The type of the traced event.
+        """
+
+        try:
+            self.trace_id = uuid.UUID(event_id).hex
+        except ValueError:
+            self.trace_id = os.urandom(16).hex()
+        self.event_id = event_id
+        self.event_type = event_type
+        self.root = Span(
+            f"dispatch {event_type}",
+            attributes={
+                "webhoogz.event.id": event_id,
+                "webhoogz.event.type": event_type,
+            },
+        )
+        self.spans = [self.root]
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Record a child span of the root span around a block of code.
+
+        Args:
+            name (str): Name of the stage.
+            **attributes: Extra data about the stage.
+
+        Yields:
+            dict: The span's attributes, which the block may add to.
+        """
+
+        span = Span(name, self.root.span_id, attributes)
+        self.spans.append(span)
+        try:
+            yield span.attributes
+        finally:
+            span.end()
+
+    def summary(self):
+        """Summarize the trace for display.
+
+        Returns:
+            dict: The event id and type, start time, total duration and the
+                duration of each stage, in milliseconds.
+        """
+
+        return {
+            "event_id": self.event_id,
+            "event_type": self.event_type,
+            "timestamp": self.root.start_ns / 1e9,
+            "duration_ms": self.root.duration_ms,
+            "spans": [
+                {
+                    "name": span.name,
+                    "config_id": span.attributes.get("config_id"),
+                    "duration_ms": span.duration_ms,
+                }
+                for span in self.spans[1:]
+            ],
+        }
+
+
+def _otlp_value(value):
+    """Convert a Python value to an OTLP JSON AnyValue."""
+
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(traces):
+    """Encode traces as an OTLP/JSON ExportTraceServiceRequest.
+
+    Args:
+        traces (list): The Trace objects to encode.
+
+    Returns:
+        dict: A document accepted by OpenTelemetry collectors on /v1/traces.
+    """
+
+    spans = []
+    for trace in traces:
+        for span in trace.spans:
+            otlp_span = {
+                "traceId": trace.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                "attributes": [
+                    {"key": key, "value": _otlp_value(value)}
+                    for key, value in span.attributes.items()
+                    if value is not None
+                ],
+            }
+            if span.parent_id:
+                otlp_span["parentSpanId"] = span.parent_id
+            spans.append(otlp_span)
+
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": "webhoogz"}}
+                    ]
+                },
+                "scopeSpans": [{"scope": {"name": "webhoogz"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+class Tracer:
+    """Records sampled per-stage traces of webhook events.
+
+    Tracing is opt-in: with a sample rate of 0, no trace is started and span()
+    costs a single context variable lookup. Finished traces are kept in a bounded
+    buffer for the admin page and exported as OTLP/JSON to a file (one document per
+    line) and/or an OpenTelemetry collector. Collector exports are posted by a single
+    background thread fed by a bounded queue; when the queue is full (slow collector
+    or high sample rate), new exports are dropped rather than piling up. Export
+    errors are logged and never raised into the traced dispatch.
+
+    Attributes:
+        sample_rate (float): Fraction of events traced, between 0 and 1.
+        export_file (str or None): Path of the OTLP/JSON lines file.
+        export_endpoint (str or None): URL of a collector's /v1/traces endpoint.
+        recent (collections.deque): The most recently finished traces.
+    """
+
+    def __init__(
+        self,
+        sample_rate=0.0,
+        buffer_size=200,
+        export_file=None,
+        export_endpoint=None,
+        export_queue_size=100,
+    ):
+        """Initialize a tracer.
+
+        Args:
+            sample_rate (float): Fraction of events traced, between 0 and 1.
+            buffer_size (int): Number of finished traces kept in memory.
+            export_file (str, optional): Path of the OTLP/JSON lines file.
+            export_endpoint (str, optional): URL of a collector's /v1/traces endpoint.
+            export_queue_size (int): Number of documents waiting for the collector
+                beyond which exports are dropped.
+        """
+
+        self.sample_rate = sample_rate
+        self.export_file = export_file
+        self.export_endpoint = export_endpoint
+        self.recent = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._exports = queue.Queue(maxsize=export_queue_size)
+        self._exporter = None
+
+    @contextmanager
+    def trace(self, event_id, event_type):
+        """Trace the dispatch of an event if it is sampled.
+
+        Spans recorded with span() inside the block are attached to the trace.
+
+        Args:
+            event_id (str): The id of the event.
+            event_type (str): The type of the event.
+
+        Yields:
+            Trace or None: The trace, or None if the event was not sampled.
+        """
+
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            yield None
+            return
+
+        trace = Trace(event_id, event_type)
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+            trace.root.end()
+            self.finish(trace)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Record a stage of the current trace around a block of code.
+
+        Does nothing beyond yielding a throwaway dict when no trace is active.
+
+        Args:
+            name (str): Name of the stage (e.g., 'http').
+            **attributes: Extra data about the stage (e.g., config_id).
+
+        Yields:
+            dict: The span's attributes, which the block may add to.
+        """
+
+        trace = _current_trace.get()
+        if trace is None:
+            yield {}
+            return
+
+        with trace.span(name, **attributes) as span_attributes:
+            yield span_attributes
+
+    def finish(self, trace):
+        """Store a finished trace and export it.
+
+        Args:
+            trace (Trace): The finished trace.
+
+        Returns:
+            None
+        """
+
+        with self._lock:
+            self.recent.append(trace)
+
+        if not self.export_file and not self.export_endpoint:
+            return
+
+        document = to_otlp([trace])
+        if self.export_file:
+            # Tracing must never fail the dispatch (or the submission) it measures
+            try:
+                with self._lock, open(self.export_file, "a") as f:
+                    f.write(json.dumps(document, separators=(",", ":")) + "\n")
+            except OSError as e:
+                print(f"[WEBHOOGZ] Trace export error: {e}")
+        if self.export_endpoint:
+            # Never delay webhook delivery on the collector
+            with self._lock:
+                if self._exporter is None:
+                    self._exporter = threading.Thread(
+                        target=self._export_loop, daemon=True
+                    )
+                    self._exporter.start()
+            try:
+                self._exports.put_nowait(document)
+            except queue.Full:
+                print("[WEBHOOGZ] Trace export queue full, trace dropped")
+
+    def _export_loop(self):
+        """Post queued OTLP/JSON documents to the configured collector, forever."""
+
+        while True:
+            document = self._exports.get()
+            try:
+                requests.post(self.export_endpoint, json=document, timeout=5)
+            except requests.exceptions.RequestException as e:
+                print(f"[WEBHOOGZ] Trace export error: {e}")
+
+    def get_slowest(self, limit=10):
+        """Retrieve the slowest recently finished traces.
+
+        Args:
+            limit (int): Maximum number of traces returned.
+
+        Returns:
+            list: Trace summaries, slowest first.
+        """
+
+        with self._lock:
+            traces = list(self.recent)
+        traces.sort(key=lambda trace: trace.root.duration_ms, reverse=True)
+        return [trace.summary() for trace in traces[:limit]]
+
+
+tracer = Tracer(
+    sample_rate=float(os.getenv("WEBHOOGZ_TRACE_SAMPLE_RATE", 0)),
+    buffer_size=int(os.getenv("WEBHOOGZ_TRACE_BUFFER", 200)),
+    export_file=os.getenv("WEBHOOGZ_TRACE_FILE"),
+    export_endpoint=os.getenv("WEBHOOGZ_TRACE_ENDPOINT"),
+)
+"""Global instance of Tracer shared by the plugin.
+
+Configured through the WEBHOOGZ_TRACE_SAMPLE_RATE (0 disables tracing),
+WEBHOOGZ_TRACE_BUFFER, WEBHOOGZ_TRACE_FILE and WEBHOOGZ_TRACE_ENDPOINT
+environment variables.
+"""
@@ -14,60 +14,87 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import os
-import json
+import uuid
 import requests
 import hmac
 import hashlib
 
-from CTFd.utils import get_config, set_config, get_app_config
+from CTFd.models import db
+from CTFd.utils import get_app_config
 from datetime import datetime
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-from .models import WebhookLog
+from .models import WebhookLog, WebhookTarget, WebhookSubscription
+from .tracing import tracer
+from .payloads import build_bodies
 
 
 class WebhookConfig:
     """Manages webhook configurations in CTFd, storing URLs and their associated events.
 
-    This class handles the loading, saving, and querying of webhook configurations,
-    including target URLs, associated events, and HMAC secrets. Configurations are
-    stored in CTFd's configuration system as JSON.
-
-    Attributes:
-        urls (dict): A dictionary mapping configuration IDs to webhook details
-            (url, events, secret).
-        next_id (int): The next available ID for a new webhook configuration.
+    This class handles the querying and row-level updating of webhook configurations,
+    including target URLs, associated events, and HMAC secrets. Targets are stored
+    as WebhookTarget rows and their events as WebhookSubscription rows, so an edit
+    only touches the rows that actually changed.
     """
 
-    def __init__(self):
-        """Initialize an empty webhook configuration."""
+    def get_targets(self):
+        """Retrieve every webhook configuration with its subscribed events.
+
+        Returns:
+            dict: A dictionary mapping configuration IDs (as strings) to webhook
+                details (url, secret, events as a set, and delivery settings).
+        """
 
-        self.urls = {}
-        self.next_id = 1
-        self.load_config()
+        targets = {
+            str(target.id): {
+                "url": target.url,
+                "secret": target.secret,
+                "events": set(),
+                "scoreboard_top_n": target.scoreboard_top_n,
+                "scoreboard_diff": target.scoreboard_diff,
+                "compression": target.compression,
+                "compression_threshold": target.compression_threshold,
+                "max_payload_bytes": target.max_payload_bytes,
+            }
+            for target in WebhookTarget.query.order_by(WebhookTarget.id).all()
+        }
+        for target_id, event_id in db.session.query(
+            WebhookSubscription.target_id, WebhookSubscription.event_id
+        ):
+            targets[str(target_id)]["events"].add(event_id)
+        return targets
+
+    def get_target(self, config_id):
+        """Get a webhook target by its configuration ID.
 
-    def load_config(self):
-        """Load webhook configurations from CTFd's config storage.
+        Args:
+            config_id (str or int): The configuration ID to query.
 
-        Retrieves the JSON-encoded webhook configuration from CTFd's database and
-        populates the urls attribute. Updates next_id based on existing IDs.
+        Returns:
+            WebhookTarget or None: The target, or None if not found.
         """
 
-        config = get_config("WEBHOOK_CONFIG")
-        if config:
-            self.urls = json.loads(config)
-            if self.urls:
-                self.next_id = max(int(id) for id in self.urls.keys()) + 1
-        else:
-            self.urls = {}
+        if not str(config_id).isdigit():
+            return None
+        return WebhookTarget.query.filter_by(id=int(config_id)).first()
 
-    def save_config(self):
-        """Save webhook configurations to CTFd's config storage.
+    def get_targets_for_event(self, event):
+        """Retrieve the targets subscribed to a specific event.
+
+        Args:
+            event (str): The event type to query (e.g., 'user_signup').
 
-        Serializes the urls attribute to JSON and stores it in CTFd's configuration.
+        Returns:
+            list: A list of WebhookTarget rows subscribed to the event.
         """
-        set_config("WEBHOOK_CONFIG", json.dumps(self.urls))
+
+        return (
+            WebhookTarget.query.join(WebhookSubscription)
+            .filter(WebhookSubscription.event_id == event)
+            .all()
+        )
 
     def get_urls_for_event(self, event):
         """Retrieve URLs configured for a specific event.
@@ -79,41 +106,113 @@ class WebhookConfig:
             list: A list of URLs configured to receive the specified event.
         """
 
-        return [
-            data["url"]
-            for data in self.urls.values()
-            if event in data.get("events", [])
-        ]
+        return [target.url for target in self.get_targets_for_event(event)]
+
+    def update_targets(self, entries, checked):
+        """Apply a submitted configuration form as row-level changes.
 
-    def get_secret_for_url(self, url):
-        """Get the HMAC secret for a given webhook URL.
+        Existing targets are updated in place, blanked ones are deleted, and new ones
+        are inserted. Subscriptions are diffed per target so that only added or
+        removed rows are written. Targets absent from the submission are left
+        untouched, so a stale form cannot drop a target created concurrently.
 
         Args:
-            url (str): The webhook URL to query.
+            entries (list): Tuples of (config_id, settings) in form order, where
+                settings maps WebhookTarget columns (url, secret, ...) to their
+                submitted values. The config_id is empty for new targets.
+            checked (dict): Maps a checkbox value (a config_id for existing targets,
+                the URL for new ones) to the set of event IDs checked for it.
 
         Returns:
-            str or None: The HMAC secret for the URL, or None if not found.
+            None
         """
 
-        for data in self.urls.values():
-            if data["url"] == url:
-                return data.get("secret")
-        return None
+        ids = [int(config_id) for config_id, _ in entries if config_id]
+        targets = {
+            str(target.id): target
+            for target in WebhookTarget.query.filter(WebhookTarget.id.in_(ids))
+        }
+        current = {}
+        for subscription in WebhookSubscription.query.filter(
+            WebhookSubscription.target_id.in_(ids)
+        ):
+            current.setdefault(str(subscription.target_id), {})[
+                subscription.event_id
+            ] = subscription
+
+        for config_id, settings in entries:
+            url = settings["url"]
+            target = targets.get(config_id)
+            if target is None:
+                if not url:
+                    continue
+                target = WebhookTarget(**settings)
+                target.subscriptions = [
+                    WebhookSubscription(event_id=event_id)
+                    for event_id in checked.get(url, ())
+                ]
+                db.session.add(target)
+                continue
+
+            if not url:
+                WebhookLog.query.filter_by(config_id=target.id).delete()
+                db.session.delete(target)
+                continue
+
+            for column, value in settings.items():
+                if getattr(target, column) != value:
+                    setattr(target, column, value)
+
+            subscribed = current.get(config_id, {})
+            wanted = checked.get(config_id, set())
+            for event_id in wanted - subscribed.keys():
+                db.session.add(
+                    WebhookSubscription(target_id=target.id, event_id=event_id)
+                )
+            for event_id in subscribed.keys() - wanted:
+                db.session.delete(subscribed[event_id])
+
+        db.session.commit()
 
-    def get_id_for_url(self, url):
-        """Get the configuration ID for a given webhook URL.
+    def delete_target(self, config_id):
+        """Delete a webhook target, its subscriptions and its logs.
 
         Args:
-            url (str): The webhook URL to query.
+            config_id (str or int): The configuration ID to delete.
 
         Returns:
-            str or None: The configuration ID for the URL, or None if not found.
+            bool: True if the target existed and was deleted, False otherwise.
         """
 
-        for id, data in self.urls.items():
-            if data["url"] == url:
-                return id
-        return None
+        target = self.get_target(config_id)
+        if target is None:
+            return False
+
+        WebhookLog.query.filter_by(config_id=target.id).delete()
+        db.session.delete(target)
+        db.session.commit()
+        return True
+
+
+_log_sessionmaker = None
+
+
+def get_log_session():
+    """Open a session independent of CTFd's request session.
+
+    Webhooks are mostly sent from SQLAlchemy event listeners, in the middle of a
+    flush of db.session, so logs and journal entries are written through a separate
+    session. The engine is created once and reused.
+
+    Returns:
+        sqlalchemy.orm.Session: A new session bound to the CTFd database.
+    """
+
+    global _log_sessionmaker
+    if _log_sessionmaker is None:
+        engine = create_engine(get_app_config("SQLALCHEMY_DATABASE_URI"))
+        _log_sessionmaker = sessionmaker(bind=engine)
+    return _log_sessionmaker()
 
 
 webhook_config = WebhookConfig()
@@ -129,40 +228,54 @@ Example:
 """
 
 
-def send_webhook(event_type, data):
+def send_webhook(event_type, data, event_id=None, targets=None):
     """Send a webhook payload to configured URLs for a given event.
 
-    Constructs a JSON payload with the event type and data, computes an HMAC signature,
-    and sends POST requests to all URLs configured for the event. Logs the results
+    Constructs a JSON payload with the event id, event type and data, computes an
+    HMAC signature, and sends POST requests to all URLs configured for the event.
+    The event id is also sent in the X-Webhoogz-Event-Id header; since it is part
+    of the signed body, receivers can trust it for deduplication. Logs the results
     using WebhookLog.
 
     Args:
         event_type (str): The type of event triggering the webhook (e.g., 'user_signup').
         data (dict): The data to include in the webhook payload.
+        event_id (str, optional): Unique id of this event occurrence. A random one
+            is generated if omitted.
+        targets (list, optional): WebhookTarget rows to send to. Defaults to the
+            targets subscribed to event_type.
 
     Returns:
-        None
+        set: The configuration IDs of the targets that answered with a 2xx status.
     """
 
-    # Get URLs configured for this event
-    target_urls = webhook_config.get_urls_for_event(event_type)
-    if not target_urls:
+    # Get targets configured for this event
+    if targets is None:
+        with tracer.span("get_targets"):
+            targets = webhook_config.get_targets_for_event(event_type)
+    if not targets:
         print(f"[WEBHOOGZ] No webhooks configured for event: {event_type}")
-        return
+        return set()
 
-    # Create payload with event and data
-    payload = {"event": event_type, "data": data}
+    # Create payload with event id, event and data
+    if event_id is None:
+        event_id = str(uuid.uuid4())
+    payload = {"id": event_id, "event": event_type, "data": data}
 
     # Initialize a new SQLAlchemy session for logging
-    engine = create_engine(get_app_config("SQLALCHEMY_DATABASE_URI"))
-    Session = sessionmaker(bind=engine)
-    log_session = Session()
+    log_session = get_log_session()
+
+    delivered = set()
+    # Bodies built for each distinct (compression, threshold, budget) setting
+    bodies = {}
 
     # Get default HMAC secret from environment
     default_secret = os.getenv("WEBHOOK_SECRET")
-    for url in target_urls:
+    for target in targets:
+        url = target.url
+        config_id = target.id
         # Use URL-specific secret or fallback to default
-        secret = webhook_config.get_secret_for_url(url) or default_secret
+        secret = target.secret or default_secret
         if not secret:
             print(
                 f"[WEBHOOGZ] No HMAC secret configured for {url} (and no WEBHOOK_SECRET env var)"
@@ -172,38 +285,59 @@ def send_webhook(event_type, data):
         # Convert to bytes for HMAC
         secret = secret.encode("utf-8")
 
-        config_id = webhook_config.get_id_for_url(url)
+        settings = (
+            target.compression or "none",
+            target.compression_threshold or 0,
+            target.max_payload_bytes or 0,
+        )
         try:
-            # Serialize payload compactly for consistent HMAC
-            body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
-
-            # Compute HMAC-SHA256 signature
-            signature = hmac.new(secret, body, digestmod=hashlib.sha256)
-            signature_hex = signature.hexdigest()
-
-            # Prepare POST request with custom headers
-            request = requests.Request(method="POST", url=url, data=body)
-            prepped = request.prepare()
-            prepped.body = body  # Override default serialization with compact version
-            prepped.headers["X-CTFd-HMAC-Signature"] = signature_hex
-            prepped.headers["Content-Type"] = "application/json"
-
-            # Send request and log response
-            with requests.Session() as session:
-                response = session.send(prepped)
-                log_entry = WebhookLog(
-                    config_id=config_id,
-                    url=url,
-                    event_type=event_type,
-                    status="success",
-                    response_code=response.status_code,
-                    timestamp=datetime.utcnow(),
-                )
-                log_session.add(log_entry)
-                log_session.commit()
-                print(f"[WEBHOOGZ] Webhook sent to {url}: {response.status_code}")
-        except requests.exceptions.RequestException as e:
-            # Log any request errors
+            # Serialize (and compress or split) once per distinct setting
+            if settings not in bodies:
+                with tracer.span("encode", config_id=config_id):
+                    bodies[settings] = build_bodies(payload, *settings)
+            parts = bodies[settings]
+
+            success = True
+            for i, (body, content_encoding) in enumerate(parts):
+                # Compute HMAC-SHA256 signature over the exact bytes sent
+                with tracer.span("hmac", config_id=config_id):
+                    signature = hmac.new(secret, body, digestmod=hashlib.sha256)
+                    signature_hex = signature.hexdigest()
+
+                # Prepare POST request with custom headers
+                request = requests.Request(method="POST", url=url, data=body)
+                prepped = request.prepare()
+                prepped.body = body  # Override default serialization with compact version
+                prepped.headers["X-CTFd-HMAC-Signature"] = signature_hex
+                prepped.headers["X-Webhoogz-Event-Id"] = event_id
+                prepped.headers["Content-Type"] = "application/json"
+                if content_encoding:
+                    prepped.headers["Content-Encoding"] = content_encoding
+                if len(parts) > 1:
+                    prepped.headers["X-Webhoogz-Event-Part"] = f"{i + 1}/{len(parts)}"
+
+                # Send request and log response
+                with requests.Session() as session:
+                    with tracer.span("http", config_id=config_id) as span:
+                        response = session.send(prepped)
+                        span["http.status_code"] = response.status_code
+                    log_entry = WebhookLog(
+                        config_id=config_id,
+                        url=url,
+                        event_type=event_type,
+                        status="success",
+                        response_code=response.status_code,
+                        timestamp=datetime.utcnow(),
+                    )
+                    with tracer.span("log_commit", config_id=config_id):
+                        log_session.add(log_entry)
+                        log_session.commit()
+                    success = success and response.ok
+                    print(f"[WEBHOOGZ] Webhook sent to {url}: {response.status_code}")
+            if success:
+                delivered.add(config_id)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # Log any request errors, or a size budget too small for the payload
             log_entry = WebhookLog(
                 config_id=config_id,
                 url=url,
@@ -212,9 +346,12 @@ def send_webhook(event_type, data):
                 error_message=str(e),
                 timestamp=datetime.utcnow(),
             )
-            log_session.add(log_entry)
-            log_session.commit()
+            with tracer.span("log_commit", config_id=config_id):
+                log_session.add(log_entry)
+                log_session.commit()
             print(f"[WEBHOOGZ] Webhook error for {url}: {e}")
         finally:
             # Always close the session
             log_session.close()
+
+    return delivered